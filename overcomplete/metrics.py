@@ -2,8 +2,16 @@
 Module dedicated for metrics of dictionary learning algorithms.
 """
 
+import numpy as np
 from scipy.optimize import linear_sum_assignment
 import torch
+from torch.nn import functional as F
+
+try:
+    # optional, faster solver for dense assignment problems
+    import lap
+except ImportError:
+    lap = None
 
 
 Epsilon = 1e-6
@@ -87,12 +95,12 @@ def avg_l2_loss(x, x_hat):
 
     Returns
     -------
-    float
-        Average L2 loss per sample.
+    torch.Tensor
+        Average L2 loss per sample, as a 0-dim tensor (no device synchronization).
     """
     assert x.shape == x_hat.shape, "Input tensors must have the same shape"
-    assert len(x.shape) == 2, "Input tensors must be 2D"
-    return torch.mean(l2(x - x_hat, 1)).item()
+    assert x.ndim == 2, "Input tensors must be 2D"
+    return torch.mean(l2(x - x_hat, 1))
 
 
 def avg_l1_loss(x, x_hat):
@@ -108,12 +116,12 @@ def avg_l1_loss(x, x_hat):
 
     Returns
     -------
-    float
-        Average L1 loss per sample.
+    torch.Tensor
+        Average L1 loss per sample, as a 0-dim tensor (no device synchronization).
     """
     assert x.shape == x_hat.shape, "Input tensors must have the same shape"
-    assert len(x.shape) == 2, "Input tensors must be 2D"
-    return torch.mean(l1(x - x_hat, 1)).item()
+    assert x.ndim == 2, "Input tensors must be 2D"
+    return torch.mean(l1(x - x_hat, 1))
 
 
 def relative_avg_l2_loss(x, x_hat, epsilon=Epsilon):
@@ -136,16 +144,16 @@ def relative_avg_l2_loss(x, x_hat, epsilon=Epsilon):
 
     Returns
     -------
-    float
-        Average relative L2 loss per sample.
+    torch.Tensor
+        Average relative L2 loss per sample, as a 0-dim tensor (no device synchronization).
     """
     assert x.shape == x_hat.shape, "Input tensors must have the same shape"
-    assert len(x.shape) == 2, "Input tensors must be 2D"
+    assert x.ndim == 2, "Input tensors must be 2D"
 
     l2_err_per_sample = l2(x - x_hat, 1)
     l2_per_sample = l2(x, 1)
 
-    return torch.mean(l2_err_per_sample / (l2_per_sample + epsilon)).item()
+    return torch.mean(l2_err_per_sample / (l2_per_sample + epsilon))
 
 
 def relative_avg_l1_loss(x, x_hat, epsilon=Epsilon):
@@ -168,16 +176,76 @@ def relative_avg_l1_loss(x, x_hat, epsilon=Epsilon):
 
     Returns
     -------
-    float
-        Average relative L1 loss per sample.
+    torch.Tensor
+        Average relative L1 loss per sample, as a 0-dim tensor (no device synchronization).
     """
     assert x.shape == x_hat.shape, "Input tensors must have the same shape"
-    assert len(x.shape) == 2, "Input tensors must be 2D"
+    assert x.ndim == 2, "Input tensors must be 2D"
 
     l1_err_per_sample = l1(x - x_hat, 1)
     l1_per_sample = l1(x, 1)
 
-    return torch.mean(l1_err_per_sample / (l1_per_sample + epsilon)).item()
+    return torch.mean(l1_err_per_sample / (l1_per_sample + epsilon))
+
+
+def _reduced_numel(x, dims):
+    """
+    Number of elements reduced when reducing x across dims.
+
+    Parameters
+    ----------
+    x : torch.Tensor
+        Input tensor.
+    dims : int or tuple
+        Reduced dimensions.
+
+    Returns
+    -------
+    int
+        Product of the sizes of the reduced dimensions.
+    """
+    if isinstance(dims, int):
+        dims = (dims,)
+    numel = 1
+    for dim in dims:
+        numel *= x.shape[dim]
+    return numel
+
+
+def reconstruction_losses(x, x_hat, epsilon=Epsilon):
+    """
+    Compute the (relative) L2 and L1 reconstruction losses at once, averaged across
+    samples. The residual x - x_hat is computed once and shared by the four losses.
+
+    Parameters
+    ----------
+    x : torch.Tensor
+        Original input tensor of shape (batch_size, d).
+    x_hat : torch.Tensor
+        Reconstructed input tensor of shape (batch_size, d).
+    epsilon : float, optional
+        Small value to avoid division by zero, by default 1e-6.
+
+    Returns
+    -------
+    dict
+        Dictionary with keys 'avg_l2_loss', 'avg_l1_loss', 'relative_avg_l2_loss' and
+        'relative_avg_l1_loss', each a 0-dim tensor.
+    """
+    assert x.shape == x_hat.shape, "Input tensors must have the same shape"
+    assert x.ndim == 2, "Input tensors must be 2D"
+
+    residual = x - x_hat
+
+    l2_err_per_sample = l2(residual, 1)
+    l1_err_per_sample = l1(residual, 1)
+
+    return {
+        'avg_l2_loss': torch.mean(l2_err_per_sample),
+        'avg_l1_loss': torch.mean(l1_err_per_sample),
+        'relative_avg_l2_loss': torch.mean(l2_err_per_sample / (l2(x, 1) + epsilon)),
+        'relative_avg_l1_loss': torch.mean(l1_err_per_sample / (l1(x, 1) + epsilon)),
+    }
 
 
 def l0(x, dims=None):
@@ -196,9 +264,10 @@ def l0(x, dims=None):
     torch.Tensor
         Average sparsity if dims=None else sparsity across dims.
     """
+    # count_nonzero reduces in a single pass without a float copy of the mask
     if dims is None:
-        return torch.mean((x == 0).float())
-    return torch.mean((x == 0).float(), dims)
+        return 1.0 - x.count_nonzero() / x.numel()
+    return 1.0 - x.count_nonzero(dims) / _reduced_numel(x, dims)
 
 
 # alias for the default sparsity metric
@@ -223,9 +292,10 @@ def sparsity_eps(x, dims=None, threshold=1e-6):
     torch.Tensor
         Average sparsity if dims=None else sparsity across dims.
     """
+    is_zero = torch.abs(x) <= threshold
     if dims is None:
-        return torch.mean((torch.abs(x) <= threshold).float())
-    return torch.mean((torch.abs(x) <= threshold).float(), dims)
+        return is_zero.sum(dtype=torch.float32) / x.numel()
+    return is_zero.sum(dims, dtype=torch.float32) / _reduced_numel(x, dims)
 
 
 # alias for the default sparsity metric with epsilon
@@ -277,7 +347,7 @@ def hoyer(x):
     torch.Tensor (batch_size,)
         Hoyer sparsity for each vector in the batch.
     """
-    assert len(x.shape) == 2, "Input tensor must be 2D"
+    assert x.ndim == 2, "Input tensor must be 2D"
 
     d_sqrt = torch.sqrt(torch.tensor(x.shape[1]))
     l1_l2 = l1_l2_ratio(x, 1)
@@ -311,7 +381,7 @@ def kappa_4(x):
     torch.Tensor
         the Kappa-4 sparsity.
     """
-    assert len(x.shape) == 2, "Input tensor must be 2D"
+    assert x.ndim == 2, "Input tensor must be 2D"
 
     x4 = (x ** 4).sum(1)
     x2_2 = x.square().sum(1).square()
@@ -340,7 +410,7 @@ def r2_score(x, x_hat):
         R^2 score.
     """
     assert x.shape == x_hat.shape, "Input tensors must have the same shape"
-    assert len(x.shape) == 2, "Input tensors must be 2D"
+    assert x.ndim == 2, "Input tensors must be 2D"
 
     ss_res = torch.mean((x - x_hat) ** 2)
     ss_tot = torch.mean((x - x.mean()) ** 2)
@@ -364,11 +434,136 @@ def dead_codes(z):
     torch.Tensor
         Tensor indicating which codes are dead.
     """
-    assert len(z.shape) == 2, "Input tensor must be 2D"
-    is_dead = (z.sum(0) == 0).float()
+    assert z.ndim == 2, "Input tensor must be 2D"
+    # a code is dead if it is zero on every sample, a sum could cancel for signed codes
+    is_dead = (z.abs().amax(0) == 0).float()
     return is_dead
 
 
+def _euclidean_distance_matrix(x, y):
+    """
+    Compute the euclidean distance matrix between two sets of vectors, using
+    ||x - y||^2 = ||x||^2 + ||y||^2 - 2 x.y to get the cross term in a single GEMM.
+
+    Parameters
+    ----------
+    x : torch.Tensor
+        First set of vectors of shape (num_vectors_x, dim).
+    y : torch.Tensor
+        Second set of vectors of shape (num_vectors_y, dim).
+
+    Returns
+    -------
+    torch.Tensor
+        Euclidean distance matrix of shape (num_vectors_x, num_vectors_y).
+    """
+    x_sq = x.square().sum(1, keepdim=True)
+    y_sq = y.square().sum(1, keepdim=True)
+
+    # rounding can make the squared distance slightly negative
+    dist_sq = torch.addmm(x_sq + y_sq.T, x, y.T, alpha=-2.0)
+
+    return dist_sq.clamp_min_(0.0).sqrt_()
+
+
+# single page-locked staging buffer, regrown only when a larger transfer is needed
+_PINNED_BUFFER = None
+
+
+def _pinned_buffer(shape, dtype):
+    """
+    Return a page-locked host buffer of the requested shape and dtype, carved out of a
+    single module-level byte buffer so repeated calls (e.g. a metric evaluated during
+    training) do not pay the pinned allocation again. The buffer is only regrown when
+    it is too small, see `release_pinned_buffer` to free it.
+
+    Parameters
+    ----------
+    shape : torch.Size
+        Shape of the buffer.
+    dtype : torch.dtype
+        Dtype of the buffer.
+
+    Returns
+    -------
+    torch.Tensor
+        Pinned host tensor, a view on the shared buffer.
+    """
+    global _PINNED_BUFFER  # pylint: disable=global-statement
+
+    nbytes = torch.Size(shape).numel() * torch.empty((), dtype=dtype).element_size()
+    if _PINNED_BUFFER is None or _PINNED_BUFFER.numel() < nbytes:
+        _PINNED_BUFFER = None
+        _PINNED_BUFFER = torch.empty(nbytes, dtype=torch.uint8, pin_memory=True)
+
+    return _PINNED_BUFFER[:nbytes].view(dtype).view(shape)
+
+
+def release_pinned_buffer():
+    """
+    Free the page-locked staging buffer used to copy cuda tensors to host.
+    It will be allocated again on the next transfer.
+    """
+    global _PINNED_BUFFER  # pylint: disable=global-statement
+    _PINNED_BUFFER = None
+
+
+def _to_host_numpy(tensor):
+    """
+    Copy a tensor to a numpy array on host, using a single transfer to a pinned
+    buffer when the tensor lives on a cuda device.
+
+    The pinned buffer is reused across calls: the returned array must be consumed
+    before the next call.
+
+    Parameters
+    ----------
+    tensor : torch.Tensor
+        Input tensor.
+
+    Returns
+    -------
+    np.ndarray
+        Host copy of the tensor.
+    """
+    tensor = tensor.detach()
+    if not tensor.is_cuda:
+        # cpu tensors are returned as a view, other devices (mps, xpu..) are copied
+        return tensor.cpu().numpy()
+
+    buffer = _pinned_buffer(tensor.shape, tensor.dtype)
+    buffer.copy_(tensor, non_blocking=True)
+    torch.cuda.current_stream(tensor.device).synchronize()
+
+    return buffer.numpy()
+
+
+def _solve_assignment(cost_matrix):
+    """
+    Solve the linear sum assignment problem on a square cost matrix.
+    Use the Jonker-Volgenant solver of `lap` if installed, scipy otherwise.
+
+    Parameters
+    ----------
+    cost_matrix : np.ndarray
+        Cost matrix of shape (n, n).
+
+    Returns
+    -------
+    row_ind : np.ndarray
+        Row indices of the optimal assignment.
+    col_ind : np.ndarray
+        Column indices of the optimal assignment.
+    """
+    if lap is None:
+        return linear_sum_assignment(cost_matrix)
+
+    _, col_ind, _ = lap.lapjv(np.ascontiguousarray(cost_matrix, dtype=np.float64))
+    row_ind = np.arange(cost_matrix.shape[0])
+
+    return row_ind, col_ind
+
+
 def hungarian_loss(dictionary1, dictionary2, p_norm=2):
     """
     Compute the Hungarian loss between two dictionaries.
@@ -388,12 +583,21 @@ def hungarian_loss(dictionary1, dictionary2, p_norm=2):
         Hungarian loss.
     """
     assert dictionary1.shape == dictionary2.shape, "Input tensors must have the same shape"
-    assert len(dictionary1.shape) == 2, "Input tensors must be 2D"
+    assert dictionary1.ndim == 2, "Input tensors must be 2D"
 
-    cost_matrix = torch.cdist(dictionary1, dictionary2, p=p_norm).cpu().numpy()
+    if p_norm == 2:
+        cost_matrix = _euclidean_distance_matrix(dictionary1, dictionary2)
+    else:
+        cost_matrix = torch.cdist(dictionary1, dictionary2, p=p_norm)
 
-    row_ind, col_ind = linear_sum_assignment(cost_matrix)
-    loss = cost_matrix[row_ind, col_ind].sum()
+    row_ind, col_ind = _solve_assignment(_to_host_numpy(cost_matrix))
+
+    # recompute the matched distances exactly, the gemm trick lose precision
+    # for atoms that are very close to each other
+    row_ind = torch.as_tensor(row_ind, device=dictionary1.device)
+    col_ind = torch.as_tensor(col_ind, device=dictionary1.device)
+    matched_diff = dictionary1[row_ind] - dictionary2[col_ind]
+    loss = torch.linalg.vector_norm(matched_diff, ord=p_norm, dim=1).sum()
 
     return float(loss)
 
@@ -414,13 +618,33 @@ def _max_non_diagonal(matrix):
     """
     assert matrix.shape[0] == matrix.shape[1], "Input must be a square matrix"
 
-    mask = ~torch.eye(matrix.shape[0], dtype=torch.bool, device=matrix.device)
-    non_diagonal_values = matrix[mask]
+    # avoid gathering the n^2 - n off-diagonal values: for each row, the largest
+    # non-diagonal value is the second largest one if the diagonal is the row max
+    top2 = torch.topk(matrix, k=2, dim=1).values
+    diagonal = matrix.diagonal()
+    row_max = torch.where(top2[:, 0] == diagonal, top2[:, 1], top2[:, 0])
 
-    return torch.max(non_diagonal_values).item()
+    return torch.max(row_max).item()
 
 
-def _cosine_distance_matrix(x, y):
+def _bf16_gemm_available(x):
+    """
+    Check if the matmuls involving x can run in bfloat16 (cuda device with bf16 support).
+
+    Parameters
+    ----------
+    x : torch.Tensor
+        Input tensor.
+
+    Returns
+    -------
+    bool
+        True if bfloat16 matmuls are supported for x.
+    """
+    return x.is_cuda and torch.cuda.is_bf16_supported()
+
+
+def _cosine_distance_matrix(x, y, low_precision=False):
     """
     Compute the cosine distance matrix between two sets of vectors.
 
@@ -430,25 +654,31 @@ def _cosine_distance_matrix(x, y):
         First set of vectors of shape (num_vectors_x, dim).
     y : torch.Tensor
         Second set of vectors of shape (num_vectors_y, dim).
+    low_precision : bool, optional
+        Whether to run the matmul in bfloat16 when supported by the device, by default False.
 
     Returns
     -------
     torch.Tensor
         Cosine distance matrix of shape (num_vectors_x, num_vectors_y).
     """
+    assert x.ndim == 2 and y.ndim == 2, "Input tensors must be 2D"
     assert x.shape[1] == y.shape[1], "Input vectors must have the same dimensionality"
-    assert len(x.shape) == 2 and len(y.shape) == 2, "Input tensors must be 2D"
 
-    x_normalized = x / x.norm(dim=1, keepdim=True)
-    y_normalized = y / y.norm(dim=1, keepdim=True)
+    x_normalized = F.normalize(x, dim=1, eps=Epsilon)
+    y_normalized = F.normalize(y, dim=1, eps=Epsilon)
 
-    cosine_similarity = torch.matmul(x_normalized, y_normalized.T)
-    cosine_distance = 1 - cosine_similarity
+    if low_precision and _bf16_gemm_available(x):
+        x_normalized = x_normalized.to(torch.bfloat16)
+        y_normalized = y_normalized.to(torch.bfloat16)
 
-    return cosine_distance
+    # 1 - x.y^T in a single gemm, the scalar input is broadcasted
+    cosine_distance = torch.addmm(x_normalized.new_ones(1), x_normalized, y_normalized.T, alpha=-1.0)
 
+    return cosine_distance.to(x.dtype)
 
-def cosine_hungarian_loss(dictionary1, dictionary2):
+
+def cosine_hungarian_loss(dictionary1, dictionary2, low_precision=False):
     """
     Compute the cosine Hungarian loss between two dictionaries.
 
@@ -458,6 +688,9 @@ def cosine_hungarian_loss(dictionary1, dictionary2):
         First dictionary tensor of shape (num_codes, dim).
     dictionary2 : torch.Tensor
         Second dictionary tensor of shape (num_codes, dim).
+    low_precision : bool, optional
+        Whether to compute the cost matrix of the assignment in bfloat16 when supported
+        by the device, by default False. The assignment may then be suboptimal.
 
     Returns
     -------
@@ -465,17 +698,23 @@ def cosine_hungarian_loss(dictionary1, dictionary2):
         Cosine Hungarian loss.
     """
     assert dictionary1.shape == dictionary2.shape, "Input tensors must have the same shape"
-    assert len(dictionary1.shape) == 2, "Input tensors must be 2D"
+    assert dictionary1.ndim == 2, "Input tensors must be 2D"
+
+    cost_matrix = _cosine_distance_matrix(dictionary1, dictionary2, low_precision=low_precision)
 
-    cost_matrix = _cosine_distance_matrix(dictionary1, dictionary2).cpu().numpy()
+    row_ind, col_ind = _solve_assignment(_to_host_numpy(cost_matrix.float()))
 
-    row_ind, col_ind = linear_sum_assignment(cost_matrix)
-    loss = cost_matrix[row_ind, col_ind].sum()
+    # recompute the matched distances in full precision, the costs may be in bfloat16
+    row_ind = torch.as_tensor(row_ind, device=dictionary1.device)
+    col_ind = torch.as_tensor(col_ind, device=dictionary1.device)
+    matched_cosine = (F.normalize(dictionary1[row_ind], dim=1, eps=Epsilon) *
+                      F.normalize(dictionary2[col_ind], dim=1, eps=Epsilon)).sum(1)
+    loss = (1.0 - matched_cosine).sum()
 
     return float(loss)
 
 
-def dictionary_collinearity(dictionary):
+def dictionary_collinearity(dictionary, normalized=False, low_precision=False):
     """
     Compute the collinearity of a dictionary.
 
@@ -483,6 +722,13 @@ def dictionary_collinearity(dictionary):
     ----------
     dictionary : torch.Tensor
         Dictionary tensor of shape (num_codes, dim).
+    normalized : bool, optional
+        Whether the rows of the dictionary already have unit l2 norm (e.g. from
+        `SAE.get_normalized_dictionary()`), in which case the normalization
+        is skipped, by default False.
+    low_precision : bool, optional
+        Whether to compute the similarities in bfloat16 when supported by the device,
+        by default False.
 
     Returns
     -------
@@ -491,11 +737,18 @@ def dictionary_collinearity(dictionary):
     cosine_similarity_matrix : torch.Tensor
         Matrix of cosine similarities across dictionary elements.
     """
-    assert len(dictionary.shape) == 2, "Input tensor must be 2D"
+    assert dictionary.ndim == 2, "Input tensor must be 2D"
 
-    normalized_dict = dictionary / (dictionary.norm(dim=1, keepdim=True) + Epsilon)
+    if normalized:
+        normalized_dict = dictionary
+    else:
+        normalized_dict = F.normalize(dictionary, dim=1, eps=Epsilon)
 
-    cosine_similarity_matrix = torch.matmul(normalized_dict, normalized_dict.T)
+    if low_precision and _bf16_gemm_available(dictionary):
+        normalized_bf16 = normalized_dict.to(torch.bfloat16)
+        cosine_similarity_matrix = torch.matmul(normalized_bf16, normalized_bf16.T).to(dictionary.dtype)
+    else:
+        cosine_similarity_matrix = torch.matmul(normalized_dict, normalized_dict.T)
     max_collinearity = _max_non_diagonal(torch.abs(cosine_similarity_matrix))
 
     return max_collinearity, cosine_similarity_matrix.detach()
@@ -519,13 +772,13 @@ def wasserstein_1d(x1, x2):
         Wasserstein distance.
     """
     assert x1.shape == x2.shape, "The two sets must have the same shape"
-    assert len(x1.shape) == 2, "Input tensors must be 2D"
+    assert x1.ndim == 2, "Input tensors must be 2D"
 
-    x1_sorted, _ = torch.sort(x1, dim=0)
-    x2_sorted, _ = torch.sort(x2, dim=0)
+    # sort both sets with a single (batched) sort call
+    sorted_stack = torch.sort(torch.stack([x1, x2]), dim=1).values
 
     # avg of wasserstein across dimensions
-    dist = torch.mean(torch.abs(x1_sorted - x2_sorted))
+    dist = torch.mean(torch.abs(sorted_stack[0] - sorted_stack[1]))
 
     return dist
 
@@ -551,7 +804,7 @@ def frechet_distance(x1, x2):
         Fréchet distance.
     """
     assert x1.shape == x2.shape, "The two sets must have the same shape"
-    assert len(x1.shape) == 2, "Input tensors must be 2D"
+    assert x1.ndim == 2, "Input tensors must be 2D"
 
     mu_x1 = torch.mean(x1, dim=0)
     mu_x2 = torch.mean(x2, dim=0)
@@ -564,10 +817,15 @@ def frechet_distance(x1, x2):
     mean_diff = mu_x1 - mu_x2
     mean_diff_squared = torch.sum(mean_diff ** 2)
 
-    cov_prod = torch.matmul(cov_x1, cov_x2)
+    # Cov_x1 Cov_x2 is similar to the symmetric Cov_x1^(1/2) Cov_x2 Cov_x1^(1/2),
+    # so we can stay in real arithmetic and use the symmetric eigen solvers
+    eigvals_x1, eigvecs_x1 = torch.linalg.eigh(cov_x1)
+    cov_x1_sqrt = (eigvecs_x1 * eigvals_x1.clamp_min(0.0).sqrt()) @ eigvecs_x1.T
 
-    eigvals = torch.linalg.eigvals(cov_prod)
-    tr_cov_prod_sqrt = eigvals.sqrt().real.sum()
+    cov_prod = cov_x1_sqrt @ cov_x2 @ cov_x1_sqrt
+
+    eigvals = torch.linalg.eigvalsh(cov_prod)
+    tr_cov_prod_sqrt = eigvals.clamp_min(0.0).sqrt().sum()
 
     dist = mean_diff_squared + trace_sum - 2.0 * tr_cov_prod_sqrt
 
@@ -590,15 +848,13 @@ def codes_correlation_matrix(codes):
     corrs : torch.Tensor
         Correlation matrix of codes.
     """
-    assert len(codes.shape) == 2, "Input tensor must be 2D"
+    assert codes.ndim == 2, "Input tensor must be 2D"
     assert codes.shape[0] > 1, "At least two samples are required"
 
-    codes_centered = codes - codes.mean(dim=0, keepdim=True)
-
-    cov = torch.matmul(codes_centered.T, codes_centered) / (codes_centered.shape[0] - 1)
-    std = torch.sqrt(torch.diag(cov))
+    corrs = torch.corrcoef(codes.T)
+    # codes that never vary (e.g dead codes) have undefined correlation, set it to 0
+    corrs = torch.nan_to_num_(corrs, nan=0.0)
 
-    corrs = cov / (torch.outer(std, std) + Epsilon)
     max_corr = _max_non_diagonal(torch.abs(corrs))
 
     return max_corr, corrs
@@ -623,11 +879,38 @@ def energy_of_codes(codes, dictionary):
     torch.Tensor
         Energy of codes, one per codes dimension.
     """
-    assert len(codes.shape) == 2, "Input tensor must be 2D"
-    assert len(dictionary.shape) == 2, "Dictionary tensor must be 2D"
+    assert codes.ndim == 2, "Input tensor must be 2D"
+    assert dictionary.ndim == 2, "Dictionary tensor must be 2D"
     assert codes.shape[1] == dictionary.shape[0], "Number of codes must match dictionary size"
 
+    # ||E[z_k] d_k|| = |E[z_k]| ||d_k||, no need to materialize E[Z]D
     avg_codes = torch.mean(codes, 0)
-    energy = l2(avg_codes[:, None] * dictionary, -1)
+    energy = avg_codes.abs() * l2(dictionary, -1)
 
     return energy
+
+
+def energy_of_codes_batched(codes, dictionary):
+    """
+    Compute the per-sample energy of codes given a dictionary.
+    for example, with x an input sample, z its codes and D the dictionary:
+    x = zD, Energy(z)_k = || z_k d_k || = |z_k| ||d_k||
+    and correspond to the energy each code brings to the reconstruction of x.
+
+    Parameters
+    ----------
+    codes : torch.Tensor
+        Codes tensor of shape (batch_size, num_codes).
+    dictionary : torch.Tensor
+        Dictionary tensor of shape (num_codes, dim).
+
+    Returns
+    -------
+    torch.Tensor
+        Energy of codes of shape (batch_size, num_codes).
+    """
+    assert codes.ndim == 2, "Input tensor must be 2D"
+    assert dictionary.ndim == 2, "Dictionary tensor must be 2D"
+    assert codes.shape[1] == dictionary.shape[0], "Number of codes must match dictionary size"
+
+    return codes.abs() * l2(dictionary, -1)
@@ -15,7 +15,34 @@ from .base import BaseOptimDictionaryLearning
 from .utils import stopping_criterion, _assert_shapes, pos_part, neg_part
 
 
-def _one_step_snmf_multiplicative_update(A, Z, D, update_Z=True, update_D=True):
+def _snmf_dictionary_terms(A, D):
+    """
+    Compute the terms of the Semi-NMF Z update that only depend on A and D.
+
+    Parameters
+    ----------
+    A : torch.Tensor
+        Activation tensor, should be (batch_size, n_features).
+    D : torch.Tensor
+        Dictionary tensor, should be (nb_concepts, n_features).
+
+    Returns
+    -------
+    ATD_pos : torch.Tensor
+        Positive part of A @ D.T, of shape (batch_size, nb_concepts).
+    ATD_neg : torch.Tensor
+        Negative part of A @ D.T, of shape (batch_size, nb_concepts).
+    DDT_parts : torch.Tensor
+        Negative and positive parts of D @ D.T stacked along the columns,
+        of shape (nb_concepts, 2 * nb_concepts).
+    """
+    ATD = A @ D.T
+    DDT = D @ D.T
+    DDT_parts = torch.cat([neg_part(DDT), pos_part(DDT)], dim=1)
+    return pos_part(ATD), neg_part(ATD), DDT_parts
+
+
+def _one_step_snmf_multiplicative_update(A, Z, D, update_Z=True, update_D=True, d_terms=None):
     """
     One step of the Semi-NMF update rules.
     The Semi-NMF algorithm updates Z and D alternately:
@@ -36,6 +63,9 @@ def _one_step_snmf_multiplicative_update(A, Z, D, update_Z=True, update_D=True):
         Whether to update Z, by default True.
     update_D : bool, optional
         Whether to update D, by default True.
+    d_terms : tuple of torch.Tensor, optional
+        Precomputed output of `_snmf_dictionary_terms(A, D)`, only valid while D
+        is not updated, by default None (computed here).
 
     Returns
     -------
@@ -48,11 +78,17 @@ def _one_step_snmf_multiplicative_update(A, Z, D, update_Z=True, update_D=True):
         # @tfel: one could also use nnls here
         # Z = matrix_nnls(D.T, A.T).T
         # instead we use the update rule from the original paper
-        ATD = A @ D.T
-        DDT = D @ D.T
-        numerator = pos_part(ATD) + (Z @ neg_part(DDT))
-        denominator = neg_part(ATD) + (Z @ pos_part(DDT))
-        Z = Z * torch.sqrt((numerator / (denominator+1e-8)) + 1e-8)
+        if d_terms is None:
+            d_terms = _snmf_dictionary_terms(A, D)
+        ATD_pos, ATD_neg, DDT_parts = d_terms
+
+        # a single GEMM gives both Z @ (DDT)^- and Z @ (DDT)^+, the rest of the
+        # update is done in place on its output
+        Z_DDT = Z @ DDT_parts
+        numerator, denominator = Z_DDT.split(Z.shape[1], dim=1)
+        numerator.add_(ATD_pos)
+        denominator.add_(ATD_neg).add_(1e-8)
+        Z = Z * numerator.div_(denominator).add_(1e-8).sqrt_()
 
     if update_D:
         ZtZ_inv = torch.linalg.pinv((Z.T @ Z) + torch.eye(Z.shape[1], device=Z.device) * 1e-8)
@@ -98,9 +134,14 @@ def snmf_multiplicative_update(A, Z, D, update_Z=True, update_D=True, max_iter=5
     """
     _assert_shapes(A, Z, D)
 
+    # when the dictionary is fixed (e.g. encoding), A @ D.T and D @ D.T
+    # are computed once instead of at every iteration
+    d_terms = None if update_D else _snmf_dictionary_terms(A, D)
+
     for _ in tqdm(range(max_iter), disable=not verbose):
-        Z_old = Z.clone()
-        Z, D = _one_step_snmf_multiplicative_update(A, Z, D, update_Z, update_D)
+        # the update is not in place, no need to copy Z
+        Z_old = Z
+        Z, D = _one_step_snmf_multiplicative_update(A, Z, D, update_Z, update_D, d_terms)
 
         if update_Z and tol > 0 and stopping_criterion(Z, Z_old, tol):
             break
@@ -108,6 +149,52 @@ def snmf_multiplicative_update(A, Z, D, update_Z=True, update_D=True, max_iter=5
     return Z, D
 
 
+def _pgd_gradients(A, Z, D, l1_penalty=0.0, update_Z=True, update_D=True):
+    """
+    Closed-form gradients of the projected gradient descent objective
+    mean((A - ZD)^2) + l1_penalty * mean(|Z|) w.r.t. Z and D.
+
+    The residual is shared by both gradients and computed with a single addmm,
+    no autograd graph is built.
+
+    Parameters
+    ----------
+    A : torch.Tensor
+        Activation tensor, should be (batch_size, n_features).
+    Z : torch.Tensor
+        Codes tensor, should (batch_size, nb_concepts).
+    D : torch.Tensor
+        Dictionary tensor, should be (nb_concepts, n_features).
+    l1_penalty : float, optional
+        L1 penalty for the sparsity constraint, by default 0.0.
+    update_Z : bool, optional
+        Whether to compute the gradient w.r.t. Z, by default True.
+    update_D : bool, optional
+        Whether to compute the gradient w.r.t. D, by default True.
+
+    Returns
+    -------
+    grad_Z : torch.Tensor or None
+        Gradient w.r.t. Z, None if update_Z is False.
+    grad_D : torch.Tensor or None
+        Gradient w.r.t. D, None if update_D is False.
+    """
+    # d/dX mean((A - ZD)^2) = -2 / A.numel() * ..., so we directly compute
+    # the scaled residual (ZD - A) * 2 / A.numel()
+    scale = 2.0 / A.numel()
+    residual = torch.addmm(A, Z, D, beta=-scale, alpha=scale)
+
+    grad_Z = grad_D = None
+    if update_Z:
+        grad_Z = residual @ D.T
+        if l1_penalty != 0.0:
+            grad_Z.add_(torch.sign(Z), alpha=l1_penalty / Z.numel())
+    if update_D:
+        grad_D = Z.T @ residual
+
+    return grad_Z, grad_D
+
+
 def snmf_projected_gradient_descent(A, Z, D, lr=5e-2, update_Z=True, update_D=True, max_iter=500, tol=1e-5,
                                     l1_penalty=0.0, verbose=False, **kwargs):
     """
@@ -162,14 +249,19 @@ def snmf_projected_gradient_descent(A, Z, D, lr=5e-2, update_Z=True, update_D=Tr
     optimizer = torch.optim.Adam(to_optimize, lr=lr, weight_decay=1e-5)
 
     for iter_i in tqdm(range(max_iter), disable=not verbose):
-        optimizer.zero_grad()
         # @tfel: see if we could pass a custom loss function
-        loss = torch.mean(torch.square(A - (Z @ D))) + l1_penalty * torch.mean(torch.abs(Z))
+        # the gradients of the loss are known in closed form, setting them
+        # directly avoids building and traversing an autograd graph each step
+        with torch.no_grad():
+            grad_Z, grad_D = _pgd_gradients(A, Z, D, l1_penalty, update_Z, update_D)
+        if update_Z:
+            Z.grad = grad_Z
+        if update_D:
+            D.grad = grad_D
 
         if update_Z:
             Z_old = Z.data.clone()
 
-        loss.backward()
         optimizer.step()
 
         with torch.no_grad():
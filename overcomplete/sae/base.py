@@ -4,9 +4,11 @@ Base module for Sparse Autoencoder (SAE) model for dictionary learning.
 
 import torch
 from torch import nn
+from torch.nn import functional as F
 from dataclasses import dataclass
 
 from ..base import BaseDictionaryLearning
+from ..metrics import Epsilon
 from .dictionary import DictionaryLayer
 from .factory import EncoderFactory
 
@@ -52,6 +54,8 @@ class SAE(BaseDictionaryLearning):
     -------
     get_dictionary():
         Return the learned dictionary.
+    get_normalized_dictionary():
+        Return the learned dictionary with unit l2 norm rows (cached in eval mode).
     forward(x):
         Perform a forward pass through the autoencoder and return a triplet of tensors composed of
         of pre_codes, codes and reconstructed input tensor.
@@ -96,6 +100,9 @@ class SAE(BaseDictionaryLearning):
 
         self.dictionary = DictionaryLayer(in_dim, nb_concepts, device=device, **(dictionary_params or {}))
 
+        # (dictionary, version, normalized) in eval mode, see get_normalized_dictionary
+        self._normalized_dictionary_cache = None
+
     def get_dictionary(self):
         """
         Return the learned dictionary.
@@ -107,6 +114,39 @@ class SAE(BaseDictionaryLearning):
         """
         return self.dictionary.get_dictionary()
 
+    def get_normalized_dictionary(self):
+        """
+        Return the learned dictionary with each concept projected on the unit l2 sphere.
+
+        The result is detached. In eval mode the dictionary is the tensor fused by
+        `.eval()`, which no weight update can change: the normalized copy is cached
+        until a new one is fused, so diagnostics called periodically (e.g.
+        `dictionary_collinearity(..., normalized=True)`) skip the normalization pass.
+        In training mode it is recomputed on every call.
+
+        Returns
+        -------
+        torch.Tensor
+            Normalized dictionary tensor of shape (nb_components, input_size).
+        """
+        dictionary = self.get_dictionary()
+
+        cache = self._normalized_dictionary_cache
+        if cache is not None and cache[0] is dictionary and cache[1] == dictionary._version:
+            return cache[2]
+
+        with torch.no_grad():
+            normalized = F.normalize(dictionary, dim=1, eps=Epsilon)
+
+        # optimizers (e.g. fused ones) can update the weights without any trace on
+        # them, only the fused eval dictionary is safe to key on
+        if not self.dictionary.training:
+            self._normalized_dictionary_cache = (dictionary, dictionary._version, normalized)
+        else:
+            self._normalized_dictionary_cache = None
+
+        return normalized
+
     def forward(self, x):
         """
         Perform a forward pass through the autoencoder.
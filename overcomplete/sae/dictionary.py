@@ -145,7 +145,8 @@ class DictionaryLayer(nn.Module):
         else:
             raise ValueError("Invalid normalization function")
 
-        # init weights
+        # init weights, stored row-major as (nb_concepts, in_dimensions): each concept is
+        # contiguous for the normalization, and decoding z @ D needs no transpose
         self._weights = nn.Parameter(torch.empty(nb_concepts, in_dimensions, device=device))
         if initializer is None:
             nn.init.xavier_uniform_(self._weights)
@@ -170,6 +171,8 @@ class DictionaryLayer(nn.Module):
         ----------
         z : torch.Tensor
             Latent representation tensor of shape (batch_size, nb_components).
+            Extra leading dimensions (..., nb_components) are folded into the
+            batch dimension.
 
         Returns
         -------
@@ -177,8 +180,10 @@ class DictionaryLayer(nn.Module):
             Reconstructed input tensor of shape (batch_size, dimensions).
         """
         dictionary = self.get_dictionary()
-        x_hat = torch.matmul(z, dictionary)
-        return x_hat
+        # fold any leading dims into a single 2D GEMM rather than a broadcasted
+        # batched matmul, for 2D codes the reshapes are free views
+        x_hat = torch.mm(z.reshape(-1, z.shape[-1]), dictionary)
+        return x_hat.reshape(*z.shape[:-1], x_hat.shape[-1])
 
     def get_dictionary(self):
         """
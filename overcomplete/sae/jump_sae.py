@@ -10,6 +10,46 @@ from .kernels import (rectangle_kernel, gaussian_kernel, triangular_kernel, cosi
                       epanechnikov_kernel, quartic_kernel, silverman_kernel, cauchy_kernel)
 
 
+def _kernel_grad_sum(x, threshold, grad_output, kernel_fn, bandwith):
+    """
+    Compute sum_i K(x_i - threshold) * grad_output_i over the batch dimension,
+    the common part of the threshold pseudo-gradients.
+
+    The per-concept scaling (which only depends on the threshold) is left to the
+    caller so it is applied on the reduced (nb_concepts,) tensor rather than on
+    the full (batch_size, nb_concepts) one.
+
+    Parameters
+    ----------
+    x : torch.Tensor
+        Input tensor of shape (batch_size, nb_concepts).
+    threshold : torch.Tensor
+        Threshold tensor of shape (nb_concepts,).
+    grad_output : torch.Tensor
+        Gradient of the loss w.r.t. the output.
+    kernel_fn : callable
+        Kernel function.
+    bandwith : float
+        Bandwith of the kernel.
+
+    Returns
+    -------
+    torch.Tensor
+        Reduced kernel-weighted gradient of shape (nb_concepts,).
+    """
+    kernel_values = kernel_fn(x - threshold, bandwith)
+
+    # the kernel output is a fresh tensor owned by us, reuse its storage for the
+    # product when it can hold it (custom kernels may broadcast or downcast)
+    if (kernel_values.shape == grad_output.shape
+            and kernel_values.dtype == torch.promote_types(kernel_values.dtype, grad_output.dtype)):
+        kernel_values.mul_(grad_output)
+    else:
+        kernel_values = kernel_values * grad_output
+
+    return kernel_values.sum(0)
+
+
 class JumpReLU(torch.autograd.Function):
     """
     JumpReLU activation function with pseudo-gradient for threshold.
@@ -31,13 +71,15 @@ class JumpReLU(torch.autograd.Function):
         bandwith : float
             Bandwith of the kernel.
         """
-        ctx.save_for_backward(x, threshold)
+        # single elementwise pass instead of clone + masked scatter, a select (not a
+        # product with the mask) so that non-finite codes below the threshold give 0
+        below = x < threshold
+        output = torch.where(below, 0.0, x)
+
+        ctx.save_for_backward(x, threshold, below)
         ctx.bandwith = bandwith
         ctx.kernel_fn = kernel_fn
 
-        output = x.clone()
-        output[x < threshold] = 0
-
         return output
 
     @staticmethod
@@ -51,22 +93,18 @@ class JumpReLU(torch.autograd.Function):
         grad_output : torch.Tensor
             Gradient of the loss w.r.t. the output.
         """
-        x, threshold = ctx.saved_tensors
+        x, threshold, below = ctx.saved_tensors
         bandwith = ctx.bandwith
         kernel_fn = ctx.kernel_fn
 
         # gradient w.r.t. input (normal gradient)
-        grad_input = grad_output.clone()
-        grad_input[x < threshold] = 0
+        grad_input = torch.where(below, 0.0, grad_output)
 
         # pseudo-gradient w.r.t. threshold parameters
-        delta = x - threshold
-        kernel_values = kernel_fn(delta, bandwith)
-
         # @tfel: we have a singularity at threshold=0, thus the
         # re-parametrization trick in JumpSAE class
-        grad_threshold = - (threshold / bandwith) * kernel_values * grad_output
-        grad_threshold = grad_threshold.sum(0)
+        grad_threshold = _kernel_grad_sum(x, threshold, grad_output, kernel_fn, bandwith)
+        grad_threshold = - (threshold / bandwith) * grad_threshold
 
         return grad_input, grad_threshold, None, None
 
@@ -120,12 +158,9 @@ class HeavisidePseudoGradient(torch.autograd.Function):
         bandwith = ctx.bandwith
         kernel_fn = ctx.kernel_fn
 
-        delta = x - threshold
-        kernel_values = kernel_fn(delta, bandwith)
-
         # see the paper for the formula
-        grad_threshold = - (1 / bandwith) * kernel_values * grad_output
-        grad_threshold = grad_threshold.sum(0)
+        grad_threshold = _kernel_grad_sum(x, threshold, grad_output, kernel_fn, bandwith)
+        grad_threshold = - (1 / bandwith) * grad_threshold
 
         grad_input = torch.zeros_like(x)
 
@@ -267,7 +302,9 @@ class JumpSAE(SAE):
                          dictionary_params, device)
 
         self.kernel_fn = self._KERNELS[kernel]
-        self.bandwith = torch.tensor(bandwith, device=device)
+        # keep the bandwith as a python float, as a (device) tensor every
+        # kernel call would launch small scalar ops and sync on `bandwith > 0`
+        self.bandwith = float(bandwith)
 
         self.thresholds = nn.Parameter(torch.zeros(nb_concepts, device=device), requires_grad=True)
 
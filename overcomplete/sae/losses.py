@@ -20,7 +20,9 @@ Additional arguments can be passed as keyword arguments.
 from functools import partial
 
 import torch
-from ..metrics import hoyer, kappa_4, lp, l1, dead_codes
+from torch.nn import functional as F
+
+from ..metrics import hoyer, kappa_4, lp, dead_codes
 
 # disable W0613 (unused-argument) to keep the same signature for all loss functions
 # pylint: disable=W0613
@@ -64,8 +66,42 @@ def _mse_with_penalty(x, x_hat, pre_codes, codes, dictionary, penalty=1.0, penal
     return mse + reg
 
 
-# l1 should be dependent on the codes dimension, hoyer and kappa are not
-mse_l1 = partial(_mse_with_penalty, penalty_fn=l1)
+def mse_l1(x, x_hat, pre_codes, codes, dictionary, penalty=1.0):
+    """
+    Compute the Mean Squared Error (MSE) loss with L1 penalty on the codes.
+
+    Loss = ||x - x_hat||^2 + penalty * ||z||_1
+
+    Same as `_mse_with_penalty` with `penalty_fn=l1`, but each term is a single
+    reduction kernel (no residual or |z| intermediate is materialized).
+
+    Parameters
+    ----------
+    x : torch.Tensor
+        Input tensor.
+    x_hat : torch.Tensor
+        Reconstructed tensor.
+    pre_codes : torch.Tensor
+        Encoded tensor before activation function.
+    codes : torch.Tensor
+        Encoded tensor.
+    dictionary : torch.Tensor
+        Dictionary tensor.
+    penalty : float, optional
+        Penalty coefficient, by default 1.0.
+
+    Returns
+    -------
+    torch.Tensor
+        Loss value.
+    """
+    mse = F.mse_loss(x_hat, x)
+    # l1 should be dependent on the codes dimension, hoyer and kappa are not
+    reg = torch.linalg.vector_norm(codes, ord=1)
+
+    return mse + penalty * reg
+
+
 mse_hoyer = partial(_mse_with_penalty, penalty_fn=hoyer)
 mse_kappa_4 = partial(_mse_with_penalty, penalty_fn=kappa_4)
 
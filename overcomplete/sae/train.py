@@ -207,9 +207,9 @@ def train_sae_amp(model, dataloader, criterion, optimizer, scheduler=None,
                   max_nan_fallbacks=5):
     """
     Train a Sparse Autoencoder (SAE) model with AMP and NaN fallback.
-    Training in fp16 with AMP and fallback to fp32 for the rest of the current
-    epoch if NaNs are detected 'max_nan_fallbacks' times. Next epoch will start
-    again in fp16.
+    Training in fp16 with AMP (bf16 on cpu) and fallback to fp32 for the
+    rest of the current epoch if NaNs are detected 'max_nan_fallbacks' times.
+    Next epoch will start again in half precision.
 
     Parameters
     ----------
@@ -243,7 +243,11 @@ def train_sae_amp(model, dataloader, criterion, optimizer, scheduler=None,
     defaultdict
         Logs of training statistics.
     """
-    scaler = torch.amp.GradScaler(device=device, enabled=True)
+    # on cpu autocast in bf16, which has the range of fp32 and needs no loss scaling,
+    # other devices keep their default autocast dtype and the grad scaler
+    device_type = torch.device(device).type
+    amp_dtype = torch.bfloat16 if device_type == "cpu" else None
+    scaler = torch.amp.GradScaler(device=device_type, enabled=device_type != "cpu")
     logs = defaultdict(list)
 
     for epoch in range(nb_epochs):
@@ -264,7 +268,7 @@ def train_sae_amp(model, dataloader, criterion, optimizer, scheduler=None,
             x = extract_input(batch).to(device, non_blocking=True)
             optimizer.zero_grad()
 
-            with torch.amp.autocast(device_type=device, enabled=True):
+            with torch.amp.autocast(device_type=device_type, dtype=amp_dtype, enabled=True):
                 z_pre, z, x_hat = model(x)
                 loss = criterion(x, x_hat, z_pre, z, model.get_dictionary())
 
@@ -279,7 +283,7 @@ def train_sae_amp(model, dataloader, criterion, optimizer, scheduler=None,
                     print(f"[Warning] NaN detected in loss at Epoch {epoch+1}, "
                           f"Iteration {len(logs['step_loss'])+1}. Switching to full precision.")
 
-                with torch.amp.autocast(device_type=device, enabled=False):
+                with torch.amp.autocast(device_type=device_type, enabled=False):
                     z_pre, z, x_hat = model(x)
                     loss = criterion(x, x_hat, z_pre, z, model.get_dictionary())
                     dead_tracker.update(z)
@@ -3,22 +3,28 @@ import pytest
 import torch
 import scipy
 
+from overcomplete import metrics
 from overcomplete.metrics import (
     avg_l2_loss,
     avg_l1_loss,
     relative_avg_l1_loss,
     relative_avg_l2_loss,
+    reconstruction_losses,
     sparsity,
     sparsity_eps,
     dead_codes,
     hungarian_loss,
+    _solve_assignment,
     _max_non_diagonal,
     _cosine_distance_matrix,
+    _pinned_buffer,
+    release_pinned_buffer,
     cosine_hungarian_loss,
     dictionary_collinearity,
     wasserstein_1d,
     codes_correlation_matrix,
     energy_of_codes,
+    energy_of_codes_batched,
     frechet_distance,
     l0,
     l1,
@@ -79,6 +85,18 @@ def test_relative_l1_loss():
     assert epsilon_equal(relative_avg_l1_loss(x, x_hat), expected_loss)
 
 
+def test_reconstruction_losses():
+    x = torch.randn(8, 4)
+    x_hat = x + 0.1 * torch.randn(8, 4)
+
+    losses = reconstruction_losses(x, x_hat)
+
+    assert epsilon_equal(losses['avg_l2_loss'], avg_l2_loss(x, x_hat))
+    assert epsilon_equal(losses['avg_l1_loss'], avg_l1_loss(x, x_hat))
+    assert epsilon_equal(losses['relative_avg_l2_loss'], relative_avg_l2_loss(x, x_hat))
+    assert epsilon_equal(losses['relative_avg_l1_loss'], relative_avg_l1_loss(x, x_hat))
+
+
 def test_sparsity():
     x = torch.tensor([[0.0, 1.0], [0.0, 0.0]])
     expected_sparsity = 3 / 4
@@ -100,6 +118,10 @@ def test_dead_codes():
     expected_dead_codes = torch.tensor([1.0, 0.0])
     assert torch.equal(dead_codes(z), expected_dead_codes)
 
+    # signed codes that sum to zero are still alive
+    z = torch.tensor([[0.0, 1.0], [0.0, -1.0]])
+    assert torch.equal(dead_codes(z), expected_dead_codes)
+
 
 def test_hungarian_loss():
     dict1 = torch.tensor([[1.0, 2.0], [3.0, 4.0]])
@@ -110,6 +132,30 @@ def test_hungarian_loss():
     assert epsilon_equal(hungarian_loss(dict1, dict1), 0.0)
 
 
+def test_solve_assignment():
+    cost_matrix = np.random.rand(50, 50)
+
+    row_ind, col_ind = _solve_assignment(cost_matrix)
+    sp_row_ind, sp_col_ind = scipy.optimize.linear_sum_assignment(cost_matrix)
+
+    assert len(set(col_ind)) == cost_matrix.shape[0]
+    assert epsilon_equal(cost_matrix[row_ind, col_ind].sum(), cost_matrix[sp_row_ind, sp_col_ind].sum())
+
+
+def test_solve_assignment_lapjv():
+    lap = pytest.importorskip("lap")
+    cost_matrix = np.random.rand(50, 50)
+
+    _, lap_col_ind, _ = lap.lapjv(cost_matrix)
+    row_ind, col_ind = _solve_assignment(cost_matrix)
+    sp_row_ind, sp_col_ind = scipy.optimize.linear_sum_assignment(cost_matrix)
+    expected_cost = cost_matrix[sp_row_ind, sp_col_ind].sum()
+
+    assert len(set(lap_col_ind)) == cost_matrix.shape[0]
+    assert epsilon_equal(cost_matrix[np.arange(50), lap_col_ind].sum(), expected_cost)
+    assert epsilon_equal(cost_matrix[row_ind, col_ind].sum(), expected_cost)
+
+
 def test_max_non_diagonal():
     matrix = torch.tensor([[1.0, 2.0], [3.0, 4.0]])
     expected_max = 3.0
@@ -135,6 +181,24 @@ def test_cosine_hungarian_loss():
     assert cosine_hungarian_loss(dict1, dict2) == 0.0
 
 
+def test_cosine_hungarian_loss_low_precision(monkeypatch):
+    dict1 = torch.randn(32, 16)
+    dict2 = torch.randn(32, 16)
+
+    cost_matrix = _cosine_distance_matrix(dict1, dict2).numpy()
+    row_ind, col_ind = scipy.optimize.linear_sum_assignment(cost_matrix)
+    optimal_loss = cost_matrix[row_ind, col_ind].sum()
+
+    # the assignment is solved on full precision costs unless requested
+    monkeypatch.setattr(metrics, "_bf16_gemm_available", lambda x: True)
+    assert epsilon_equal(cosine_hungarian_loss(dict1, dict2), optimal_loss, epsilon=1e-4)
+
+    # bfloat16 costs can only lead to a (slightly) worse assignment
+    low_precision_loss = cosine_hungarian_loss(dict1, dict2, low_precision=True)
+    assert low_precision_loss >= optimal_loss - 1e-4
+    assert low_precision_loss < optimal_loss + 1.0
+
+
 def test_dictionary_collinearity():
     dict1 = torch.tensor([[1.0, 0.0], [0.0, 1.0]])
     dict2 = torch.tensor([[1.0, 0.0], [1.0, 0.0]])
@@ -145,6 +209,38 @@ def test_dictionary_collinearity():
     max_col, _ = dictionary_collinearity(dict2)
     assert epsilon_equal(max_col, 1.0, 1e-3)
 
+    max_col, _ = dictionary_collinearity(dict2, normalized=True)
+    assert epsilon_equal(max_col, 1.0, 1e-3)
+
+
+
+def test_dictionary_collinearity_low_precision(monkeypatch):
+    dictionary = torch.randn(16, 8)
+    max_col, cosine = dictionary_collinearity(dictionary)
+
+    # only use bfloat16 when requested, even if the device supports it
+    monkeypatch.setattr(metrics, "_bf16_gemm_available", lambda x: True)
+    _, cosine_fp32 = dictionary_collinearity(dictionary)
+    assert torch.equal(cosine, cosine_fp32)
+
+    max_col_bf16, cosine_bf16 = dictionary_collinearity(dictionary, low_precision=True)
+    assert cosine_bf16.dtype == dictionary.dtype
+    assert not torch.equal(cosine, cosine_bf16)
+    assert epsilon_equal(cosine_bf16, cosine, epsilon=2e-2)
+    assert abs(max_col_bf16 - max_col) < 2e-2
+
+
+def test_cosine_distance_matrix_low_precision(monkeypatch):
+    x = torch.randn(16, 8)
+    y = torch.randn(12, 8)
+    expected = _cosine_distance_matrix(x, y)
+
+    monkeypatch.setattr(metrics, "_bf16_gemm_available", lambda x: True)
+    assert torch.equal(_cosine_distance_matrix(x, y), expected)
+
+    low_precision = _cosine_distance_matrix(x, y, low_precision=True)
+    assert low_precision.dtype == x.dtype
+    assert epsilon_equal(low_precision, expected, epsilon=2e-2)
 
 def test_wasserstein_1d():
     x1 = torch.tensor([[1.0, 2.0], [1.0, 2.0]])
@@ -173,6 +269,21 @@ def test_energy_of_codes():
     assert epsilon_equal(energy_of_codes(codes, dictionary), expected_energy)
 
 
+def test_energy_of_codes_batched():
+    codes = torch.tensor([[1.0, 0.0],
+                          [0.0, -2.0]])
+    dictionary = torch.tensor([[1.0, 2.0], [3.0, 4.0]])
+
+    expected_energy = torch.tensor([[5.0**0.5, 0.0],
+                                    [0.0, 2.0 * 5.0]])
+
+    assert epsilon_equal(energy_of_codes_batched(codes, dictionary), expected_energy)
+
+    # averaging the codes first gives back the (batch-level) energy of codes
+    assert epsilon_equal(energy_of_codes_batched(codes.mean(0, keepdim=True), dictionary)[0],
+                         energy_of_codes(codes, dictionary))
+
+
 def test_frechet_distance():
     mean1 = torch.tensor([0.0, 0.0])
     cov1 = torch.tensor([[1.0, 0.5], [0.5, 1.0]])
@@ -289,3 +400,27 @@ def test_r2_score_partial_reconstruction():
     x_hat = torch.tensor([[1.0, 1.5], [3.0, 3.5]])
     r2 = r2_score(x, x_hat)
     assert 0 < r2 < 1
+
+
+@pytest.mark.skipif(not torch.cuda.is_available(), reason="pinned memory requires cuda")
+def test_pinned_buffer_regrown_only_when_too_small():
+    release_pinned_buffer()
+    large = _pinned_buffer((8, 8), torch.float32)
+    small = _pinned_buffer((2, 3), torch.float64)
+    assert small.shape == (2, 3) and small.dtype == torch.float64
+    assert small.data_ptr() == large.data_ptr()
+
+    bigger = _pinned_buffer((16, 16), torch.float32)
+    assert bigger.shape == (16, 16)
+    release_pinned_buffer()
+
+
+def test_metrics_assertion_messages():
+    with pytest.raises(AssertionError, match="Input tensor must be 2D"):
+        hoyer(torch.randn(4))
+    with pytest.raises(AssertionError, match="Input tensors must be 2D"):
+        avg_l2_loss(torch.randn(4), torch.randn(4))
+    with pytest.raises(AssertionError, match="The two sets must have the same shape"):
+        wasserstein_1d(torch.randn(4, 2), torch.randn(5, 2))
+    with pytest.raises(AssertionError, match="Dictionary tensor must be 2D"):
+        energy_of_codes(torch.randn(4, 3), torch.randn(3))
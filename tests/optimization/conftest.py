@@ -0,0 +1,46 @@
+import warnings
+
+import pytest
+import torch
+from joblib import Memory
+from sklearn.decomposition import NMF as SkNMF
+from sklearn.exceptions import ConvergenceWarning
+
+from overcomplete.metrics import relative_avg_l2_loss
+
+from .constants import data_shape, nb_concepts
+
+
+def _fit_sklearn_nmf(A_np, n_components, init, max_iter):
+    sk_model = SkNMF(n_components=n_components, init=init, solver='mu', max_iter=max_iter)
+    with warnings.catch_warnings():
+        # the baseline only needs to be close to convergence
+        warnings.simplefilter("ignore", ConvergenceWarning)
+        Z_sk = sk_model.fit_transform(A_np)
+    return Z_sk, sk_model.components_
+
+
+@pytest.fixture(scope="session")
+def A():
+    """
+    Non-negative activations, drawn with a fixed seed so that the sklearn
+    baseline below can be cached across runs.
+    """
+    return torch.rand(data_shape, dtype=torch.float32, generator=torch.Generator().manual_seed(0))
+
+
+@pytest.fixture(scope="session")
+def sk_baseline(request, A):
+    """
+    Sklearn NMF for benchmarking, persisted in the pytest cache (keyed on the
+    data and hyperparameters) so that repeated runs skip the fit.
+    """
+    cache = getattr(request.config, "cache", None)
+    memory = Memory(cache.mkdir("sknmf") if cache is not None else None, verbose=0)
+
+    # deterministic nndsvda init (nndsvd zeros cannot be updated by 'mu'),
+    # reaches the error of 1000 iterations of the random init in 200
+    Z_sk, D_sk = memory.cache(_fit_sklearn_nmf)(A.numpy(), nb_concepts, 'nndsvda', 200)
+    sk_error = relative_avg_l2_loss(A, Z_sk @ D_sk)
+
+    return Z_sk, D_sk, sk_error
@@ -0,0 +1,7 @@
+"""
+Shapes shared by the optimization tests and their conftest fixtures.
+"""
+
+# shape of the shared activations and number of concepts of the sklearn baseline
+data_shape = (50, 10)
+nb_concepts = 5
@@ -61,11 +61,11 @@ def test_nmf_encode_decode():
 def test_nmf_reconstruction_error(solver):
     """Test that the reconstruction error decreases after fitting."""
     model = NMF(nb_concepts=nb_concepts, solver=solver, max_iter=100)
-    initial_error = torch.norm(A - model.init_random_z(A) @ model.init_random_d(A), 'fro')
+    initial_error = torch.linalg.vector_norm(torch.addmm(A, model.init_random_z(A), model.init_random_d(A), alpha=-1))
     model.fit(A)
     Z = model.encode(A)
     A_hat = model.decode(Z)
-    final_error = torch.norm(A - A_hat, 'fro')
+    final_error = torch.linalg.vector_norm(A - A_hat)
     assert final_error < initial_error, "Reconstruction error did not decrease after fitting"
 
 
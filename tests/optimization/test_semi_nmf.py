@@ -1,23 +1,23 @@
 import pytest
 import torch
-from sklearn.decomposition import NMF as SkNMF
 
 from overcomplete.optimization import SemiNMF
+from overcomplete.optimization.semi_nmf import _pgd_gradients
 from overcomplete.metrics import relative_avg_l2_loss, sparsity
 
+from .constants import data_shape, nb_concepts
 
-data_shape = (50, 10)
-nb_concepts = 5
-
-A = torch.rand(data_shape, dtype=torch.float32)
+solvers = ['mu', 'pgd']
 
-# Sklearn NMF for benchmarking
-sk_model = SkNMF(n_components=nb_concepts, init='random', solver='mu', max_iter=1000)
-Z_sk = sk_model.fit_transform(A.numpy())
-D_sk = sk_model.components_
-sk_error = relative_avg_l2_loss(A, Z_sk @ D_sk)
 
-solvers = ['mu', 'pgd']
+@pytest.fixture(scope="module", autouse=True)
+def _single_thread():
+    # the (50, 10) problems are far too small for intra-op parallelism to pay off,
+    # pin to one thread for this module only and restore afterwards
+    num_threads = torch.get_num_threads()
+    torch.set_num_threads(1)
+    yield
+    torch.set_num_threads(num_threads)
 
 
 @pytest.mark.parametrize("solver", solvers)
@@ -28,11 +28,11 @@ def test_semi_nmf_initialization(solver):
 
 
 @pytest.mark.parametrize("solver", solvers)
-def test_semi_nmf_fit(solver):
+def test_semi_nmf_fit(solver, A):
     """Test that the SemiNMF model can fit to the data."""
     model = SemiNMF(nb_concepts=nb_concepts, max_iter=2, solver=solver)
     Z, D = model.fit(A)
-    assert (Z >= 0).all(), "Negative values in Z."
+    assert Z.min().item() >= 0, "Negative values in Z."
     assert D.shape == (nb_concepts, data_shape[1]), "Incorrect shape for D."
     assert Z.shape == (data_shape[0], nb_concepts), "Incorrect shape for Z."
 
@@ -43,18 +43,18 @@ def test_semi_nmf_negative_data(solver):
     negative_data = torch.randn(data_shape, dtype=torch.float32)
     model = SemiNMF(nb_concepts=nb_concepts, solver=solver)
     Z, D = model.fit(negative_data)
-    assert (Z >= 0).all(), "Negative values in Z."
+    assert Z.min().item() >= 0, "Negative values in Z."
     # D can be negative, so we don't check it
 
 
 @pytest.mark.parametrize("solver", solvers)
-def test_semi_nmf_encode_decode(solver):
+def test_semi_nmf_encode_decode(solver, A):
     """Test the encode and decode methods of the SemiNMF model."""
     model = SemiNMF(nb_concepts=nb_concepts, max_iter=2, solver=solver)
     model.fit(A)
 
     Z = model.encode(A)
-    assert (Z >= 0).all(), "Negative values in encoded data."
+    assert Z.min().item() >= 0, "Negative values in encoded data."
     assert Z.shape == (data_shape[0], nb_concepts), "Incorrect shape for encoded data."
 
     A_hat = model.decode(Z)
@@ -62,17 +62,17 @@ def test_semi_nmf_encode_decode(solver):
 
 
 @pytest.mark.parametrize("solver", solvers)
-def test_semi_nmf_reconstruction_error(solver):
+def test_semi_nmf_reconstruction_error(solver, A):
     """Test that the reconstruction error decreases after fitting."""
     model = SemiNMF(nb_concepts=nb_concepts, max_iter=100, solver=solver)
     init_z = model.init_random_z(A)
     init_d = model.init_random_d(A, init_z)
-    initial_error = torch.norm(A - init_z @ init_d, 'fro')
+    initial_error = torch.linalg.vector_norm(torch.addmm(A, init_z, init_d, alpha=-1))
     model.fit(A)
     Z = model.encode(A)
     A_hat = model.decode(Z)
-    final_error = torch.norm(A - A_hat, 'fro')
-    assert (Z >= 0).all(), "Negative values in Z."
+    final_error = torch.linalg.vector_norm(A - A_hat)
+    assert Z.min().item() >= 0, "Negative values in Z."
     assert final_error < initial_error, "Reconstruction error did not decrease."
 
 
@@ -82,13 +82,13 @@ def test_semi_nmf_zero_data(solver):
     zero_data = torch.zeros(data_shape)
     model = SemiNMF(nb_concepts=nb_concepts, solver=solver)
     Z, D = model.fit(zero_data)
-    reconstruction_error = torch.norm(zero_data - Z @ D, 'fro')
-    assert (Z >= 0).all(), "Negative values in Z."
+    reconstruction_error = torch.linalg.vector_norm(torch.addmm(zero_data, Z, D, alpha=-1))
+    assert Z.min().item() >= 0, "Negative values in Z."
     assert reconstruction_error < 1e-5, "Model did not reconstruct zero data correctly."
 
 
 @pytest.mark.parametrize("solver", solvers)
-def test_semi_nmf_large_number_of_components(solver):
+def test_semi_nmf_large_number_of_components(solver, A):
     """Test the SemiNMF model with varying number of components."""
     small_model = SemiNMF(nb_concepts=1, solver=solver)
     small_model.fit(A)
@@ -101,27 +101,40 @@ def test_semi_nmf_large_number_of_components(solver):
     assert error_large <= error_small, "Higher error with more components."
 
 
+def _fit_within(A, solver, target_error, max_iter_ladder):
+    """
+    One independent SemiNMF fit, escalating along `max_iter_ladder` (warm-starting
+    from the previous Z, D) until the error is below `target_error`.
+    """
+    model = SemiNMF(nb_concepts=nb_concepts, solver=solver)
+    Z, D = model.fit(A, max_iter=max_iter_ladder[0])
+
+    for done_iter, next_iter in zip(max_iter_ladder, max_iter_ladder[1:] + (None,)):
+        assert Z.min().item() >= 0, "Negative values in Z."
+        if relative_avg_l2_loss(A, Z @ D) < target_error:
+            return True
+        if next_iter is not None:
+            Z, D = model.solver_fn(A, Z, D, max_iter=next_iter - done_iter, tol=model.tol,
+                                   l1_penalty=model.l1_penalty)
+
+    return False
+
+
 @pytest.mark.parametrize("solver", solvers)
-def test_compare_to_sklearn(solver, repetitions=10):
+def test_compare_to_sklearn(solver, A, sk_baseline, repetitions=10, max_iter_ladder=(100, 300, 1000)):
     """
     Test that SemiNMF achieves similar performance to sklearn NMF.
     """
-    is_ok = False
-    for _ in range(repetitions):
-        our_model = SemiNMF(nb_concepts=nb_concepts, max_iter=1000, solver=solver)
-        Z, D = our_model.fit(A)
-        our_error = relative_avg_l2_loss(A, Z @ D)
+    _, _, sk_error = sk_baseline
 
-        assert (Z >= 0).all(), "Negative values in Z."
-
-        if our_error < 2.0 * sk_error:
-            is_ok = True
-            break
+    # the repetitions are independent, but a single short fit usually succeeds:
+    # running them lazily (and serially) beats paying for a process pool
+    is_ok = any(_fit_within(A, solver, 2.0 * sk_error, max_iter_ladder) for _ in range(repetitions))
 
     assert is_ok, "SemiNMF did not match sklearn NMF performance."
 
 
-def test_sparsity():
+def test_sparsity(A):
     # ensure that having stronger penalty induce better sparsity on the solution
     model = SemiNMF(nb_concepts=nb_concepts, max_iter=1000, solver='pgd', l1_penalty=0.0)
     Z, D = model.fit(A)
@@ -135,6 +148,22 @@ def test_sparsity():
     assert s_Z_strong > s_Z, "Stronger penalty should induce better sparsity."
 
 
+@pytest.mark.parametrize("l1_penalty", [0.0, 0.5])
+def test_pgd_gradients_match_autograd(l1_penalty, A):
+    """Test that the closed-form PGD gradients match the autograd ones."""
+    Z = torch.rand(data_shape[0], nb_concepts, requires_grad=True)
+    D = torch.randn(nb_concepts, data_shape[1], requires_grad=True)
+
+    loss = torch.mean(torch.square(A - (Z @ D))) + l1_penalty * torch.mean(torch.abs(Z))
+    loss.backward()
+
+    with torch.no_grad():
+        grad_Z, grad_D = _pgd_gradients(A, Z, D, l1_penalty)
+
+    assert torch.allclose(grad_Z, Z.grad, atol=1e-6)
+    assert torch.allclose(grad_D, D.grad, atol=1e-6)
+
+
 @pytest.mark.parametrize("solver", solvers)
 def test_snmf_to_device(solver):
     """Test that the SNMF model can move to the 'meta' device and handle lightweight initialization."""
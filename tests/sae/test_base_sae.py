@@ -1,7 +1,8 @@
 import pytest
 
 import torch
-from overcomplete.sae import SAE, DictionaryLayer, JumpSAE, TopKSAE, QSAE, BatchTopKSAE
+from overcomplete.sae import (SAE, DictionaryLayer, JumpSAE, TopKSAE, QSAE, BatchTopKSAE,
+                              RelaxedArchetypalDictionary)
 
 all_sae = [SAE, JumpSAE, TopKSAE, QSAE, BatchTopKSAE]
 
@@ -58,3 +59,80 @@ def test_sae_device(sae_class):
     # ensure dictionary is on the meta device
     dictionary = model.get_dictionary()
     assert dictionary.device.type == 'meta'
+
+
+def _expected_normalized(model):
+    dictionary = model.get_dictionary().detach()
+    return dictionary / dictionary.norm(dim=1, keepdim=True)
+
+
+@pytest.mark.parametrize("sae_class", all_sae)
+@pytest.mark.parametrize("fused", [False, True])
+def test_sae_get_normalized_dictionary(sae_class, fused):
+    input_size = 10
+    nb_concepts = 5
+    model = sae_class(input_size, nb_concepts)
+
+    normalized = model.get_normalized_dictionary()
+    assert normalized.shape == (nb_concepts, input_size)
+    assert torch.allclose(normalized.norm(dim=1), torch.ones(nb_concepts), atol=1e-5)
+
+    # fused optimizers update the weights without bumping their version counter,
+    # in training mode the normalized dictionary follows every step
+    optimizer = torch.optim.Adam(model.parameters(), lr=1e-1, fused=fused)
+    for param in model.parameters():
+        # codes may all be inactive at init (e.g. JumpSAE), set the gradients directly
+        param.grad = torch.randn_like(param)
+    optimizer.step()
+
+    updated = model.get_normalized_dictionary()
+    assert not torch.equal(updated, normalized)
+    assert torch.allclose(updated, _expected_normalized(model), atol=1e-5)
+
+
+@pytest.mark.parametrize("sae_class", all_sae)
+def test_sae_get_normalized_dictionary_cached_in_eval(sae_class):
+    model = sae_class(10, 5)
+    model.eval()
+
+    normalized = model.get_normalized_dictionary()
+    assert model.get_normalized_dictionary() is normalized
+    assert torch.allclose(normalized, _expected_normalized(model), atol=1e-5)
+
+    # a new dictionary is fused when going back to eval mode
+    model.train()
+    with torch.no_grad():
+        model.dictionary._weights.add_(torch.randn(5, 10))
+    model.eval()
+
+    updated = model.get_normalized_dictionary()
+    assert updated is not normalized
+    assert torch.allclose(updated, _expected_normalized(model), atol=1e-5)
+
+
+@pytest.mark.parametrize("sae_class", all_sae)
+def test_sae_get_normalized_dictionary_follows_dtype_and_data(sae_class):
+    model = sae_class(10, 5)
+    normalized = model.get_normalized_dictionary()
+    assert normalized.dtype == torch.float32
+
+    model.double()
+    normalized = model.get_normalized_dictionary()
+    assert normalized.dtype == model.get_dictionary().dtype == torch.float64
+
+    # assigning new weights through `.data` does not bump the version counter
+    model.dictionary._weights.data = torch.randn(5, 10, dtype=torch.float64)
+    assert torch.allclose(model.get_normalized_dictionary(), _expected_normalized(model), atol=1e-6)
+
+
+def test_sae_get_normalized_dictionary_archetypal():
+    model = SAE(10, 5)
+    model.dictionary = RelaxedArchetypalDictionary(10, 5, torch.randn(20, 10))
+
+    normalized = model.get_normalized_dictionary()
+    assert normalized.shape == (5, 10)
+    assert torch.allclose(normalized.norm(dim=1), torch.ones(5), atol=1e-5)
+
+    model.eval()
+    normalized = model.get_normalized_dictionary()
+    assert model.get_normalized_dictionary() is normalized
@@ -1,7 +1,7 @@
 import pytest
 import torch
 
-from overcomplete.sae.jump_sae import jump_relu, heaviside
+from overcomplete.sae.jump_sae import jump_relu, heaviside, JumpSAE
 from overcomplete.sae.kernels import (
     rectangle_kernel, gaussian_kernel, triangular_kernel,
     cosine_kernel, epanechnikov_kernel, quartic_kernel,
@@ -145,5 +145,31 @@ def test_jumprelu_backward_specific_values():
     # minus sign come from the fact that:
     # 'increasing the threshold will decrease the output'
     expected_grad_threshold = torch.tensor([-1.0, -1.0, 0.0], dtype=torch.float32)
-    assert torch.allclose(threshold.grad, expected_grad_threshold), f"Expected grad_threshold {
-        expected_grad_threshold}, but got {threshold.grad}"
+    assert torch.allclose(threshold.grad, expected_grad_threshold), \
+        f"Expected grad_threshold {expected_grad_threshold}, but got {threshold.grad}"
+
+
+def test_jumprelu_non_finite_below_threshold():
+    # codes below the threshold are zeroed, even if non-finite (e.g. fp16 overflow)
+    x = torch.tensor([[-float("inf"), 1.0, -0.5]], requires_grad=True)
+    threshold = torch.zeros(3, requires_grad=True)
+
+    output = jump_relu(x, threshold, rectangle_kernel, bandwith=1.0)
+    assert torch.equal(output, torch.tensor([[0.0, 1.0, 0.0]]))
+
+    output.backward(torch.full_like(output, float("inf")))
+    assert torch.equal(x.grad, torch.tensor([[0.0, float("inf"), 0.0]]))
+
+
+@pytest.mark.parametrize("kernel", JumpSAE._KERNELS.keys())
+def test_jump_sae_compiles_without_graph_breaks(kernel):
+    # the forward and the custom pseudo-gradient backward must trace as a single graph
+    model = JumpSAE(8, 16, kernel=kernel)
+    x = torch.randn(4, 8)
+
+    compiled_model = torch.compile(model, fullgraph=True, backend="aot_eager")
+    _, z, x_hat = compiled_model(x)
+    (x_hat.square().mean() + z.abs().mean()).backward()
+
+    assert model.thresholds.grad is not None
+    assert not torch.isnan(model.thresholds.grad).any()
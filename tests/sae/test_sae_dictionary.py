@@ -39,6 +39,13 @@ def test_dictionary_layer_forward():
 
     assert x_hat.shape == (batch_size, dimensions)
 
+    # tokens codes (batch_size, seq_len, nb_concepts) are folded into the batch dim
+    z_tokens = torch.randn(batch_size, 7, nb_concepts)
+    x_hat_tokens = layer.forward(z_tokens)
+
+    assert x_hat_tokens.shape == (batch_size, 7, dimensions)
+    assert epsilon_equal(x_hat_tokens, torch.matmul(z_tokens, layer.get_dictionary()))
+
 
 def test_dictionary_layer_get_dictionary():
     nb_concepts = 5
@@ -52,42 +59,38 @@ def test_dictionary_layer_get_dictionary():
     assert epsilon_equal(norms, expected_norms)
 
 
-def test_dictionary_layer_normalizations():
-    nb_concepts = 5
-    dimensions = 10
+NORMALIZATIONS = ['l2', 'max_l2', 'l1', 'max_l1', 'identity']
+
+
+def _check_normalization(normalization, dictionary, weights):
+    if normalization == 'l2':
+        assert epsilon_equal(torch.norm(dictionary, p=2, dim=1), torch.ones(dictionary.shape[0]))
+    elif normalization == 'max_l2':
+        assert torch.all(torch.norm(dictionary, p=2, dim=1) <= 1.0 + 1e-4)
+    elif normalization == 'l1':
+        assert epsilon_equal(torch.norm(dictionary, p=1, dim=1), torch.ones(dictionary.shape[0]))
+    elif normalization == 'max_l1':
+        assert torch.all(torch.norm(dictionary, p=1, dim=1) <= 1.0 + 1e-4)
+    else:
+        assert torch.equal(dictionary, weights)
+
+
+@pytest.fixture(scope="module")
+def shared_dictionary_layer():
+    return DictionaryLayer(10, 5, normalization='identity')
+
+
+@pytest.mark.parametrize("normalization", NORMALIZATIONS)
+def test_dictionary_layer_normalizations(normalization, shared_dictionary_layer):
+    # a single layer is reused, only its normalization and weights are swapped
+    layer = shared_dictionary_layer
+    layer.normalization = DictionaryLayer.NORMALIZATIONS[normalization]
+    with torch.no_grad():
+        # fresh weights for each normalization, set norms greater than 1
+        layer._weights.copy_(torch.randn(layer.nb_concepts, layer.in_dimensions) * 2)
 
-    # Test 'l2' normalization
-    layer_l2 = DictionaryLayer(dimensions, nb_concepts, normalization='l2')
-    dictionary_l2 = layer_l2.get_dictionary()
-    norms_l2 = torch.norm(dictionary_l2, p=2, dim=1)
-    expected_norms_l2 = torch.ones(nb_concepts)
-    assert epsilon_equal(norms_l2, expected_norms_l2)
-
-    # Test 'max_l2' normalization
-    layer_max_l2 = DictionaryLayer(dimensions, nb_concepts, normalization='max_l2')
-    layer_max_l2._weights.data *= 2  # Set norms greater than 1
-    dictionary_max_l2 = layer_max_l2.get_dictionary()
-    norms_max_l2 = torch.norm(dictionary_max_l2, p=2, dim=1)
-    assert torch.all(norms_max_l2 <= 1.0 + 1e-4)
-
-    # Test 'l1' normalization
-    layer_l1 = DictionaryLayer(dimensions, nb_concepts, normalization='l1')
-    dictionary_l1 = layer_l1.get_dictionary()
-    norms_l1 = torch.norm(dictionary_l1, p=1, dim=1)
-    expected_norms_l1 = torch.ones(nb_concepts)
-    assert epsilon_equal(norms_l1, expected_norms_l1)
-
-    # Test 'max_l1' normalization
-    layer_max_l1 = DictionaryLayer(dimensions, nb_concepts, normalization='max_l1')
-    layer_max_l1._weights.data *= 2  # Set norms greater than 1
-    dictionary_max_l1 = layer_max_l1.get_dictionary()
-    norms_max_l1 = torch.norm(dictionary_max_l1, p=1, dim=1)
-    assert torch.all(norms_max_l1 <= 1.0 + 1e-4)
-
-    # Test 'identity' normalization
-    layer_identity = DictionaryLayer(dimensions, nb_concepts, normalization='identity')
-    dictionary_identity = layer_identity.get_dictionary()
-    assert torch.equal(dictionary_identity, layer_identity._weights)
+    dictionary = layer.get_dictionary()
+    _check_normalization(normalization, dictionary, layer._weights)
 
 
 def test_dictionary_layer_get_dictionary_normalization():
@@ -103,47 +106,46 @@ def test_dictionary_layer_get_dictionary_normalization():
     assert epsilon_equal(norms, expected_norms)
 
 
+@pytest.mark.parametrize("fused", [False, True])
+def test_dictionary_layer_normalization_after_updates(fused):
+    nb_concepts = 5
+    dimensions = 10
+    layer = DictionaryLayer(dimensions, nb_concepts, normalization='l2')
+
+    # fused optimizers update the weights without bumping their version counter,
+    # the projection must still be applied on the next call
+    optimizer = torch.optim.Adam(layer.parameters(), lr=1.0, fused=fused)
+    for _ in range(3):
+        layer(torch.randn(3, nb_concepts)).square().sum().backward()
+        optimizer.step()
+        optimizer.zero_grad()
+        dictionary = layer.get_dictionary()
+        assert epsilon_equal(torch.norm(dictionary, p=2, dim=1), torch.ones(nb_concepts))
+
+    # and so do edits through `.data`, in place or not
+    layer._weights.data *= 2
+    assert epsilon_equal(torch.norm(layer.get_dictionary(), p=2, dim=1), torch.ones(nb_concepts))
+
+    layer._weights.data = torch.randn(nb_concepts, dimensions) * 2
+    assert epsilon_equal(torch.norm(layer.get_dictionary(), p=2, dim=1), torch.ones(nb_concepts))
+
+    # as well as swapping the normalization
+    layer.normalization = DictionaryLayer.NORMALIZATIONS['l1']
+    assert epsilon_equal(torch.norm(layer.get_dictionary(), p=1, dim=1), torch.ones(nb_concepts))
+
+
+@pytest.mark.parametrize("normalization", NORMALIZATIONS)
 @pytest.mark.parametrize("sae_class", [SAE, QSAE, TopKSAE, JumpSAE, BatchTopKSAE])
-def test_sae_init_dictionary_layer_normalizations(sae_class):
+def test_sae_init_dictionary_layer_normalizations(sae_class, normalization):
     nb_concepts = 5
     dimensions = 10
 
-    # Test 'l2' normalization
-    sae_l2 = sae_class(input_shape=dimensions, nb_concepts=nb_concepts,
-                       dictionary_params={'normalization': 'l2'})
-
-    dictionary_l2 = sae_l2.get_dictionary()
-    norms_l2 = torch.norm(dictionary_l2, p=2, dim=1)
-    expected_norms_l2 = torch.ones(nb_concepts)
-    assert epsilon_equal(norms_l2, expected_norms_l2)
-
-    # Test 'max_l2' normalization
-    sae_max_l2 = sae_class(input_shape=dimensions, nb_concepts=nb_concepts,
-                           dictionary_params={'normalization': 'max_l2'})
-    dictionary_max_l2 = sae_max_l2.get_dictionary()
-    norms_max_l2 = torch.norm(dictionary_max_l2, p=2, dim=1)
-    assert torch.all(norms_max_l2 <= 1.0 + 1e-4)
-
-    # Test 'l1' normalization
-    sae_l1 = sae_class(input_shape=dimensions, nb_concepts=nb_concepts,
-                       dictionary_params={'normalization': 'l1'})
-    dictionary_l1 = sae_l1.get_dictionary()
-    norms_l1 = torch.norm(dictionary_l1, p=1, dim=1)
-    expected_norms_l1 = torch.ones(nb_concepts)
-    assert epsilon_equal(norms_l1, expected_norms_l1)
-
-    # Test 'max_l1' normalization
-    sae_max_l1 = sae_class(input_shape=dimensions, nb_concepts=nb_concepts,
-                           dictionary_params={'normalization': 'max_l1'})
-    dictionary_max_l1 = sae_max_l1.get_dictionary()
-    norms_max_l1 = torch.norm(dictionary_max_l1, p=1, dim=1)
-    assert torch.all(norms_max_l1 <= 1.0 + 1e-4)
-
-    # Test 'identity' normalization
+    # the normalization is passed through the dictionary params at init
     sae = sae_class(input_shape=dimensions, nb_concepts=nb_concepts,
-                    dictionary_params={'normalization': 'identity'})
-    dictionary_identity = sae.get_dictionary()
-    assert torch.equal(dictionary_identity, sae.dictionary._weights)
+                    dictionary_params={'normalization': normalization})
+
+    dictionary = sae.get_dictionary()
+    _check_normalization(normalization, dictionary, sae.dictionary._weights)
 
 
 @pytest.mark.parametrize("sae_class", [SAE, QSAE, TopKSAE, JumpSAE, BatchTopKSAE])
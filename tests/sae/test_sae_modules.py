@@ -15,6 +15,13 @@ WIDTH = 28
 N_COMPONENTS = 10
 
 
+@pytest.fixture(autouse=True)
+def _inference_mode():
+    # these tests only check forward outputs, skip the autograd bookkeeping
+    with torch.inference_mode():
+        yield
+
+
 @pytest.mark.parametrize("input_size, n_components, hidden_dim, nb_blocks", [
     (INPUT_SIZE, N_COMPONENTS, None, 1),
     (INPUT_SIZE, N_COMPONENTS, 64, 3),
@@ -100,8 +107,9 @@ def test_resnet_encoder(input_shape, n_components, hidden_dim, nb_blocks):
     (INPUT_CHANNELS, 128, 2, nn.GELU),
 ])
 def test_resnet_block_configurations(input_channels, out_channels, stride, activation):
-    x = torch.randn(BATCH_SIZE, input_channels, HEIGHT, WIDTH)
-    model = ResNetBlock(input_channels, out_channels, stride, activation)
+    # channels_last is the native layout of the cpu (oneDNN) and cudnn conv kernels
+    x = torch.randn(BATCH_SIZE, input_channels, HEIGHT, WIDTH).to(memory_format=torch.channels_last)
+    model = ResNetBlock(input_channels, out_channels, stride, activation).to(memory_format=torch.channels_last)
     output = model(x)
     assert output.shape == (BATCH_SIZE, out_channels, HEIGHT // stride, WIDTH // stride)
     assert isinstance(output, torch.Tensor)
@@ -112,8 +120,8 @@ def test_resnet_block_configurations(input_channels, out_channels, stride, activ
     (16, 112, 112, 3, 128),
 ])
 def test_resnet_block_input_shapes(batch_size, height, width, input_channels, out_channels):
-    x = torch.randn(batch_size, input_channels, height, width)
-    model = ResNetBlock(input_channels, out_channels, stride=2)
+    x = torch.randn(batch_size, input_channels, height, width).to(memory_format=torch.channels_last)
+    model = ResNetBlock(input_channels, out_channels, stride=2).to(memory_format=torch.channels_last)
     output = model(x)
     assert output.shape == (batch_size, out_channels, height // 2, width // 2)
     assert isinstance(output, torch.Tensor)
@@ -142,7 +150,7 @@ def test_resnet_block_downsampling():
     assert output_no_downsample.shape == (BATCH_SIZE, 64, HEIGHT, WIDTH)
 
 
-@pytest.mark.parametrize("module_name, args, kwargs", [
+FACTORY_MODULES = [
     ("linear", (INPUT_SIZE, N_COMPONENTS), {}),
     ("mlp_bn_1", (INPUT_SIZE, N_COMPONENTS), {}),
     ("mlp_ln_1", (INPUT_SIZE, N_COMPONENTS), {}),
@@ -152,7 +160,18 @@ def test_resnet_block_downsampling():
     ("resnet_3b", ((INPUT_CHANNELS, HEIGHT, WIDTH), N_COMPONENTS), {"hidden_dim": 128}),
     ("attention_1b", ((SEQ_LENGTH, INPUT_SIZE), N_COMPONENTS), {"hidden_dim": 64}),
     ("attention_3b", ((SEQ_LENGTH, INPUT_SIZE), N_COMPONENTS), {"hidden_dim": 64})
-])
+]
+
+
+def _factory_input(module_name):
+    if module_name.startswith("resnet"):
+        return torch.randn(BATCH_SIZE, INPUT_CHANNELS, HEIGHT, WIDTH)
+    if module_name.startswith("attention"):
+        return torch.randn(BATCH_SIZE, SEQ_LENGTH, INPUT_SIZE)
+    return torch.randn(BATCH_SIZE, INPUT_SIZE)
+
+
+@pytest.mark.parametrize("module_name, args, kwargs", FACTORY_MODULES)
 def test_module_factory(module_name, args, kwargs):
 
     model = EncoderFactory.create_module(module_name, *args, **kwargs)
@@ -171,6 +190,22 @@ def test_module_factory(module_name, args, kwargs):
         assert pre_codes.shape == codes.shape == (BATCH_SIZE * SEQ_LENGTH, N_COMPONENTS)
 
 
+@pytest.mark.skipif(not hasattr(torch, "compile"), reason="torch.compile requires torch>=2.0")
+@pytest.mark.parametrize("module_name, args, kwargs", FACTORY_MODULES)
+def test_module_factory_compiles(module_name, args, kwargs):
+    # users can wrap the encoders in torch.compile, ensure they trace as a single
+    # graph with static shapes (aot_eager: no C++ toolchain needed on cpu)
+    model = EncoderFactory.create_module(module_name, *args, **kwargs).eval()
+    compiled_model = torch.compile(model, fullgraph=True, dynamic=False, backend="aot_eager")
+
+    x = _factory_input(module_name)
+    pre_codes, codes = model(x)
+    compiled_pre_codes, compiled_codes = compiled_model(x)
+
+    assert torch.allclose(pre_codes, compiled_pre_codes, atol=1e-5)
+    assert torch.allclose(codes, compiled_codes, atol=1e-5)
+
+
 def test_invalid_module():
     with pytest.raises(ValueError):
         EncoderFactory.create_module("invalid_module_name", INPUT_SIZE, N_COMPONENTS)
@@ -15,6 +15,47 @@ from ..utils import epsilon_equal
 all_sae = [SAE, JumpSAE, TopKSAE, QSAE, BatchTopKSAE]
 
 
+def _seeded_randn(*shape, seed=0):
+    return torch.randn(*shape, generator=torch.Generator().manual_seed(seed))
+
+
+def _make_dataloader(data):
+    # the models are trained on cpu: no workers (no process spawn) and no pinned memory
+    return DataLoader(TensorDataset(data), batch_size=10)
+
+
+# the (deterministic) inputs and dataloaders are shared across the tests of
+# this module, the models are not
+@pytest.fixture(scope="session")
+def rand_2d():
+    return _seeded_randn(10, 10)
+
+
+@pytest.fixture(scope="session")
+def rand_3d():
+    return _seeded_randn(10, 10, 64, seed=1)
+
+
+@pytest.fixture(scope="session")
+def rand_4d():
+    return _seeded_randn(10, 10, 5, 5, seed=2)
+
+
+@pytest.fixture(scope="module")
+def small_dataloader(rand_2d):
+    return _make_dataloader(rand_2d)
+
+
+@pytest.fixture(scope="module")
+def image_dataloader(rand_4d):
+    return _make_dataloader(rand_4d)
+
+
+@pytest.fixture(scope="module")
+def tokens_dataloader(rand_3d):
+    return _make_dataloader(rand_3d)
+
+
 @pytest.mark.parametrize(
     "module_name",
     [
@@ -26,17 +67,13 @@ all_sae = [SAE, JumpSAE, TopKSAE, QSAE, BatchTopKSAE]
     ]
 )
 @pytest.mark.parametrize("sae_class", all_sae)
-def test_train_mlp_sae(module_name, sae_class):
+def test_train_mlp_sae(module_name, sae_class, small_dataloader):
     """Ensure we can train MLP SAE using common configurations."""
-    torch.autograd.set_detect_anomaly(True)
-
-    data = torch.randn(10, 10)
-    dataset = TensorDataset(data)
-    dataloader = DataLoader(dataset, batch_size=10)
+    dataloader = small_dataloader
     criterion = mse_l1
     n_components = 2
 
-    model = sae_class(data.shape[1], n_components, encoder_module=module_name)
+    model = sae_class(10, n_components, encoder_module=module_name)
 
     optimizer = optim.SGD(model.parameters(), lr=0.001)
     scheduler = None
@@ -63,7 +100,7 @@ def test_train_mlp_sae(module_name, sae_class):
         criterion,
         optimizer,
         scheduler,
-        nb_epochs=2,
+        nb_epochs=1,
         monitoring=2,
         device="cpu",
     )
@@ -76,30 +113,26 @@ def test_train_mlp_sae(module_name, sae_class):
 
 
 @pytest.mark.parametrize("sae_class", all_sae)
-def test_train_resnet_sae(sae_class):
+def test_train_resnet_sae(sae_class, image_dataloader):
     """Ensure we can train resnet sae"""
-    torch.autograd.set_detect_anomaly(True)
-
     def criterion(x, x_hat, z_pre, z, dictionary):
         x = rearrange(x, 'n c w h -> (n w h) c')
         return mse_l1(x, x_hat, z_pre, z, dictionary)
 
-    data = torch.randn(10, 10, 5, 5)
-    dataset = TensorDataset(data)
-    dataloader = DataLoader(dataset, batch_size=10)
+    dataloader = image_dataloader
     n_components = 2
 
-    model = sae_class(data.shape[1:], n_components, encoder_module="resnet_3b")
+    model = sae_class((10, 5, 5), n_components, encoder_module="resnet_3b")
 
     optimizer = optim.SGD(model.parameters(), lr=0.001)
     scheduler = None
 
-    logs = train_sae(model, dataloader, criterion, optimizer, scheduler, nb_epochs=2, monitoring=False, device="cpu")
+    logs = train_sae(model, dataloader, criterion, optimizer, scheduler, nb_epochs=1, monitoring=False, device="cpu")
 
     assert isinstance(logs, defaultdict)
     assert len(logs) == 0
 
-    logs = train_sae_amp(model, dataloader, criterion, optimizer, scheduler, nb_epochs=2, monitoring=2, device="cpu")
+    logs = train_sae_amp(model, dataloader, criterion, optimizer, scheduler, nb_epochs=1, monitoring=2, device="cpu")
     assert isinstance(logs, defaultdict)
     assert "z" in logs
     assert "z_l2" in logs
@@ -108,31 +141,27 @@ def test_train_resnet_sae(sae_class):
 
 
 @pytest.mark.parametrize("sae_class", all_sae)
-def test_train_attention_sae(sae_class):
+def test_train_attention_sae(sae_class, tokens_dataloader):
     """Ensure we can train attention sae"""
-    torch.autograd.set_detect_anomaly(True)
-
     def criterion(x, x_hat, z_pre, z, dictionary):
         x = rearrange(x, 'n t c -> (n t) c')
         return mse_l1(x, x_hat, z_pre, z, dictionary)
 
-    data = torch.randn(10, 10, 64)
-    dataset = TensorDataset(data)
-    dataloader = DataLoader(dataset, batch_size=10)
+    dataloader = tokens_dataloader
     n_components = 2
 
-    model = sae_class(data.shape[1:], n_components, encoder_module="attention_3b")
+    model = sae_class((10, 64), n_components, encoder_module="attention_3b")
 
     optimizer = optim.SGD(model.parameters(), lr=0.001)
     scheduler = None
 
     logs = train_sae_amp(model, dataloader, criterion, optimizer, scheduler,
-                         nb_epochs=2, monitoring=False, device="cpu")
+                         nb_epochs=1, monitoring=False, device="cpu")
 
     assert isinstance(logs, defaultdict)
     assert len(logs) == 0
 
-    logs = train_sae(model, dataloader, criterion, optimizer, scheduler, nb_epochs=2, monitoring=2, device="cpu")
+    logs = train_sae(model, dataloader, criterion, optimizer, scheduler, nb_epochs=1, monitoring=2, device="cpu")
     assert isinstance(logs, defaultdict)
     assert "z" in logs
     assert "z_l2" in logs
@@ -152,15 +181,13 @@ def test_train_attention_sae(sae_class):
     ]
 )
 @pytest.mark.parametrize("sae_class", all_sae)
-def test_train_without_amp(module_name, sae_class):
+def test_train_without_amp(module_name, sae_class, small_dataloader):
     """Ensure we can train SAE without AMP."""
-    data = torch.randn(10, 10)
-    dataset = TensorDataset(data)
-    dataloader = DataLoader(dataset, batch_size=10)
+    dataloader = small_dataloader
     criterion = mse_l1
     n_components = 2
 
-    model = sae_class(data.shape[1], n_components, encoder_module=module_name)
+    model = sae_class(10, n_components, encoder_module=module_name)
 
     optimizer = optim.SGD(model.parameters(), lr=0.001)
     scheduler = None
@@ -171,7 +198,7 @@ def test_train_without_amp(module_name, sae_class):
         criterion,
         optimizer,
         scheduler,
-        nb_epochs=2,
+        nb_epochs=1,
         monitoring=False,
         device="cpu",
     )
@@ -180,15 +207,13 @@ def test_train_without_amp(module_name, sae_class):
     assert len(logs) == 0
 
 
-def test_monitoring():
+def test_monitoring(small_dataloader):
     """Ensure monitoring granularity is working."""
-    data = torch.randn(10, 10)
-    dataset = TensorDataset(data)
-    dataloader = DataLoader(dataset, batch_size=10)
+    dataloader = small_dataloader
     criterion = mse_l1
     n_components = 2
 
-    model = SAE(data.shape[1], n_components, encoder_module="linear")
+    model = SAE(10, n_components, encoder_module="linear")
 
     optimizer = optim.SGD(model.parameters(), lr=0.001)
     scheduler = None
@@ -237,14 +262,13 @@ def test_monitoring():
     assert "z" in logs
 
 
-def test_top_k_constraint():
+def test_top_k_constraint(rand_2d, small_dataloader):
     # test that top-k sae are returning only k non-zero codes before and after training
     N = 10
     top_k = 2
 
-    data = torch.randn(N, 10)
-    dataset = TensorDataset(data)
-    dataloader = DataLoader(dataset, batch_size=10)
+    data = rand_2d
+    dataloader = small_dataloader
     criterion = mse_l1
     n_components = 4
 
@@ -263,7 +287,7 @@ def test_top_k_constraint():
         criterion,
         optimizer,
         scheduler,
-        nb_epochs=2,
+        nb_epochs=1,
         monitoring=False,
         device="cpu",
     )
@@ -276,15 +300,13 @@ def test_top_k_constraint():
     assert len(logs) == 0
 
 
-def test_q_sae_quantization_levels():
+def test_q_sae_quantization_levels(rand_2d, small_dataloader):
     # ensure the quantization levels of q-sae are respected
     # and are also trainable
-    N = 10
     quantization_levels = 2
 
-    data = torch.randn(N, 10)
-    dataset = TensorDataset(data)
-    dataloader = DataLoader(dataset, batch_size=10)
+    data = rand_2d
+    dataloader = small_dataloader
     criterion = mse_l1
 
     model = QSAE(data.shape[1], 4, encoder_module="linear", q=quantization_levels,
@@ -308,7 +330,7 @@ def test_q_sae_quantization_levels():
         criterion,
         optimizer,
         scheduler,
-        nb_epochs=2,
+        nb_epochs=1,
         monitoring=False,
         device="cpu",
     )
@@ -325,3 +347,16 @@ def test_q_sae_quantization_levels():
 
     assert isinstance(logs, defaultdict)
     assert len(logs) == 0
+
+
+@pytest.mark.parametrize("sae_class", all_sae)
+def test_train_sae_fused_optimizer_keeps_dictionary_normalized(sae_class, small_dataloader):
+    model = sae_class(10, 8)
+    # fused optimizers do not bump the version counter of the parameters they update
+    optimizer = optim.Adam(model.parameters(), lr=1e-1, fused=True)
+
+    train_sae(model, small_dataloader, mse_l1, optimizer, nb_epochs=3, monitoring=False, device="cpu")
+    assert epsilon_equal(model.get_dictionary().norm(dim=1), torch.ones(8), epsilon=1e-5)
+
+    model.eval()
+    assert epsilon_equal(model.get_dictionary().norm(dim=1), torch.ones(8), epsilon=1e-5)
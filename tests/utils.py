@@ -7,19 +7,23 @@ import torch
 import numpy as np
 
 
-def _to_npf64(x):
+def _to_np(x):
     if isinstance(x, np.ndarray):
-        return x.astype(np.float64)
+        return x
     if isinstance(x, torch.Tensor):
-        return x.numpy().astype(np.float64)
-    return np.array(x).astype(np.float64)
+        return x.numpy()
+    return np.asarray(x)
 
 
 def epsilon_equal(x, y, epsilon=1e-6):
     if isinstance(x, torch.Tensor) and isinstance(y, torch.Tensor):
         return torch.allclose(x, y, atol=epsilon)
 
-    x = _to_npf64(x)
-    y = _to_npf64(y)
+    x = _to_np(x)
+    y = _to_np(y)
 
-    return np.allclose(x, y, atol=epsilon)
+    # float32 rounding is below the tolerance, no need to upcast both inputs
+    if x.dtype == y.dtype == np.float32 and epsilon >= 1e-6:
+        return np.allclose(x, y, atol=epsilon)
+
+    return np.allclose(x.astype(np.float64), y.astype(np.float64), atol=epsilon)